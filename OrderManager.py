@@ -3,51 +3,128 @@ import time
 import os
 import sys
 import json
+import threading
+import selectors
 import multiprocessing as mp
+from typing import Optional
+from shared_memory_utils import SharedOrderRing, RecvBuffer, decode_order, set_low_latency_options, pin_to_core
 
 # Configuration constants
 ORDER_MANAGER_PORT = 8002
 MESSAGE_DELIMITER = b'\n'
 HOST = '127.0.0.1'
+ORDER_RING_IDLE_SLEEP = 0.0001  # Back-off while the order ring is empty (100us)
+CLIENT_BUFFER_POOL_SIZE = 4  # Receive buffers preallocated at startup (one per connected client)
 
-# Global buffer to handle fragmented messages across socket reads
-recv_buffer = b''
 
+def _log_order(order: dict):
+    """Logs an executed order."""
+    print(
+        f"[OM|EXECUTED] Order {order['order_id']:<4}: {order['side']:<4} {order['quantity']:<2} {order['symbol']:<5} @ {order['price']:.2f} (TS: {order['timestamp']:.2f})")
 
-def receive_framed_message(sock: socket.socket) -> str:
+
+def _dispatch_frames(recv_buffer: RecvBuffer):
     """
-    Receives bytes from the socket and returns a single framed message.
-    Handles message fragmentation and buffering.
+    Logs every complete order frame in recv_buffer; a trailing partial frame stays buffered.
     """
-    global recv_buffer
+    while (raw_order := recv_buffer.next_frame(MESSAGE_DELIMITER)) is not None:
+        try:
+            _log_order(decode_order(raw_order))
+        except json.JSONDecodeError:
+            print(f"[OM] Serialization Error: Received invalid JSON.", file=sys.stderr)
+
 
+def _drain_client(sock: socket.socket, recv_buffer: RecvBuffer) -> bool:
+    """
+    Reads and dispatches everything a client has queued, until the socket would block,
+    so one readiness event serves any number of reads.
+    Returns False once the client has disconnected.
+    """
     while True:
-        # Try to find a complete message in the existing buffer
-        delimiter_pos = recv_buffer.find(MESSAGE_DELIMITER)
-        if delimiter_pos != -1:
-            # Found a complete message
-            message = recv_buffer[:delimiter_pos]
-            recv_buffer = recv_buffer[delimiter_pos + len(MESSAGE_DELIMITER):]
-            return message.decode('utf-8')
+        try:
+            n_bytes = recv_buffer.recv_into(sock)
+        except BlockingIOError:
+            return True
+        except (ConnectionResetError, BufferError) as e:
+            print(f"[OM] Dropping Strategy client: {e}", file=sys.stderr)
+            return False
 
-        # If no complete message, read more data
-        chunk = sock.recv(4096)
-        if not chunk:
-            # Connection closed
-            raise ConnectionResetError("Strategy client closed the connection.")
+        if not n_bytes:
+            return False
+        # Frames are parsed in place and must be consumed before the next recv_into
+        _dispatch_frames(recv_buffer)
 
-        recv_buffer += chunk
 
+def _serve_socket_clients(server_socket: socket.socket):
+    """
+    Serves every Strategy client from a single selector (epoll) loop: accepts all
+    pending connections and drains every frame a client has queued on each wakeup.
+    Receive buffers come from a pool allocated up front and are recycled on disconnect.
+    """
+    selector = selectors.DefaultSelector()
+    server_socket.setblocking(False)
+    selector.register(server_socket, selectors.EVENT_READ)
+    free_buffers = [RecvBuffer() for _ in range(CLIENT_BUFFER_POOL_SIZE)]
+    recv_buffers = {}  # client socket -> the RecvBuffer it borrowed from the pool
+
+    while True:
+        try:
+            for key, _ in selector.select():
+                sock = key.fileobj
 
-def run_ordermanager():
+                if sock is server_socket:
+                    # Accept every connection waiting in the backlog
+                    while True:
+                        try:
+                            client_socket, addr = server_socket.accept()
+                        except BlockingIOError:
+                            break
+                        client_socket.setblocking(False)
+                        set_low_latency_options(client_socket)
+                        selector.register(client_socket, selectors.EVENT_READ)
+                        recv_buffers[client_socket] = free_buffers.pop() if free_buffers else RecvBuffer()
+                        print(f"[OM] Accepted connection from Strategy: {addr}")
+                    continue
+
+                if not _drain_client(sock, recv_buffers[sock]):
+                    print("[OM] Strategy client disconnected. Waiting for a new connection...")
+                    selector.unregister(sock)
+                    sock.close()
+                    # Return the buffer to the pool for the next client
+                    recv_buffer = recv_buffers.pop(sock)
+                    recv_buffer.reset()
+                    free_buffers.append(recv_buffer)
+
+        except Exception as e:
+            print(f"[OM] An unexpected error occurred: {e}", file=sys.stderr)
+            time.sleep(1)
+
+
+def _drain_order_ring(order_ring: SharedOrderRing):
+    """Polls the shared-memory order ring and logs every order published into it."""
+    while True:
+        orders = order_ring.consume()
+        for order in orders:
+            _log_order(order)
+        if not orders:
+            time.sleep(ORDER_RING_IDLE_SLEEP)
+
+
+def run_ordermanager(order_ring_name: Optional[str] = None, core_id: Optional[int] = None):
     """
-    Acts as a TCP server receiving Order objects from Strategy clients.
+    Receives Order objects from Strategy clients.
+    If order_ring_name is given, orders are drained from that shared-memory ring and
+    the TCP server keeps running on a background thread as the fallback path
+    (e.g. for clients on another host).
     """
     pid = os.getpid()
     print(f"[OM|PID:{pid}] Starting OrderManager...")
+    if pin_to_core(core_id):
+        print(f"[OM|PID:{pid}] Pinned to core {core_id}.")
 
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    set_low_latency_options(server_socket)
 
     try:
         server_socket.bind((HOST, ORDER_MANAGER_PORT))
@@ -57,27 +134,16 @@ def run_ordermanager():
         print(f"[OM] Failed to start server: {e}", file=sys.stderr)
         return
 
-    while True:
-        try:
-            # Wait for Strategy to connect
-            client_socket, addr = server_socket.accept()
-            print(f"[OM] Accepted connection from Strategy: {addr}")
-
-            global recv_buffer
-            recv_buffer = b''  # Clear buffer on fresh connection
-
-            while True:
-                raw_order = receive_framed_message(client_socket)
-                order = json.loads(raw_order)
-                print(
-                    f"[OM|EXECUTED] Order {order['order_id']:<4}: {order['side']:<4} {order['quantity']:<2} {order['symbol']:<5} @ {order['price']:.2f} (TS: {order['timestamp']:.2f})")
-
-        except ConnectionResetError as e:
-            print(f"[OM] Strategy client disconnected: {e}. Waiting for a new connection...")
-            if 'client_socket' in locals():
-                client_socket.close()
-        except json.JSONDecodeError:
-            print(f"[OM] Serialization Error: Received invalid JSON.", file=sys.stderr)
-        except Exception as e:
-            print(f"[OM] An unexpected error occurred: {e}", file=sys.stderr)
-            time.sleep(1)
\ No newline at end of file
+    if order_ring_name is None:
+        _serve_socket_clients(server_socket)
+        return
+
+    try:
+        order_ring = SharedOrderRing(shm_name=order_ring_name, create=False)
+    except FileNotFoundError:
+        print(f"[OM] Fatal: Order ring '{order_ring_name}' not found. Exiting.", file=sys.stderr)
+        return
+
+    threading.Thread(target=_serve_socket_clients, args=(server_socket,), name="OMSocketFallback",
+                     daemon=True).start()
+    _drain_order_ring(order_ring)
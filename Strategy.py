@@ -2,14 +2,21 @@ import socket
 import time
 import os
 import sys
-import json
+import select
 import numpy as np
-import multiprocessing as mp
-from collections import deque
+from functools import partial
 from typing import Optional
-from shared_memory_utils import SharedPriceBook, SocketStreamClosed, close_shared_price_book
+from shared_memory_utils import (SharedPriceBook, SharedOrderRing, SocketStreamClosed, close_shared_price_book,
+                                 RecvBuffer, NEWS_RECORD_STRUCT, encode_order, set_low_latency_options,
+                                 price_record_size, PRICE_WIRE_DTYPE, pin_to_core, PriceRecordReader)
+
+try:
+    from numba import njit  # Optional JIT for the per-tick strategy kernel
+except ImportError:
+    njit = None
 
 # Configuration constants
+GATEWAY_PRICE_PORT = 8000
 GATEWAY_NEWS_PORT = 8001
 ORDER_MANAGER_PORT = 8002
 MESSAGE_DELIMITER = b'\n'
@@ -22,87 +29,318 @@ SHORT_WINDOW = 5  # For moving average
 LONG_WINDOW = 20  # For moving average
 MAX_HISTORY = LONG_WINDOW * 2  # Keep twice the long window of history
 
+# Signals and positions are encoded as +1 (BUY / LONG), -1 (SELL / SHORT), 0 (NEUTRAL / NONE)
+SIGNAL_NAMES = {1: 'BUY', -1: 'SELL', 0: 'NEUTRAL'}
+
+
+def _strategy_step(history, idx, count, sum_short, sum_long, new_prices, sentiment,
+                   short_ma, long_ma, out_signals):
+    """
+    One tick of the strategy in a single typed loop: appends new_prices to the ring
+    buffer, maintains the running sums and writes the MAs and +1 / -1 / 0 signals into
+    the preallocated output arrays. Same maths as update_price_history + compute_signals.
+    Returns the news signal.
+    """
+    news_signal = 0
+    if sentiment > BULLISH_THRESHOLD:
+        news_signal = 1
+    elif sentiment < BEARISH_THRESHOLD:
+        news_signal = -1
+
+    for i in range(new_prices.shape[0]):
+        price = new_prices[i]
+        if price > 0:
+            pos = idx[i]
+            evicted_short = history[i, (pos + MAX_HISTORY - SHORT_WINDOW) % MAX_HISTORY]
+            evicted_long = history[i, (pos + MAX_HISTORY - LONG_WINDOW) % MAX_HISTORY]
+            history[i, pos] = price
+            sum_short[i] += price - evicted_short
+            sum_long[i] += price - evicted_long
+            idx[i] = (pos + 1) % MAX_HISTORY
+            count[i] = min(count[i] + 1, MAX_HISTORY)
+
+        short_ma[i] = sum_short[i] / SHORT_WINDOW
+        long_ma[i] = sum_long[i] / LONG_WINDOW
+
+        price_signal = 0
+        if count[i] >= LONG_WINDOW and price > 0:
+            if short_ma[i] > long_ma[i]:
+                price_signal = 1
+            elif short_ma[i] < long_ma[i]:
+                price_signal = -1
+        out_signals[i] = price_signal if price_signal == news_signal else 0
+
+    return news_signal
+
+
+# Compiled to native code when numba is installed; otherwise StrategyState uses NumPy
+STRATEGY_KERNEL = njit(cache=True)(_strategy_step) if njit is not None else None
+
 
 # State object for the strategy
 class StrategyState:
+    """
+    Per-symbol price history kept as a NumPy ring buffer (one row per symbol),
+    with running sums for the short and long windows so moving averages are O(1).
+    """
     def __init__(self, symbols):
-        self.price_history = {sym: deque(maxlen=MAX_HISTORY) for sym in symbols}
-        self.position = {sym: 'NONE' for sym in symbols}  # NONE, LONG, or SHORT
+        self.symbols = list(symbols)
+        self.symbol_to_index = {sym: i for i, sym in enumerate(self.symbols)}
+        num_symbols = len(self.symbols)
+
+        self.prices = np.zeros((num_symbols, MAX_HISTORY))
+        self.idx = np.zeros(num_symbols, dtype=np.int64)  # Next slot to write per symbol
+        self.count = np.zeros(num_symbols, dtype=np.int64)  # Valid samples per symbol
+        self.sum_short = np.zeros(num_symbols)
+        self.sum_long = np.zeros(num_symbols)
+
+        self.position = np.zeros(num_symbols, dtype=np.int8)  # 0 NONE, 1 LONG, -1 SHORT
         self.order_counter = 1
 
-    def update_price_history(self, ticks):
-        for sym, price in ticks.items():
-            if price > 0:
-                self.price_history[sym].append(price)
+        # Output arrays reused by the JIT kernel on every tick
+        self.short_ma = np.zeros(num_symbols)
+        self.long_ma = np.zeros(num_symbols)
+        self.signals = np.zeros(num_symbols, dtype=np.int8)
+
+    def step(self, prices: np.ndarray, sentiment: int):
+        """
+        Records one price sample per symbol and computes this tick's signals.
+        Returns (final_signal, short_ma, long_ma, news_signal) like compute_signals.
+        """
+        if STRATEGY_KERNEL is None:
+            self.update_price_history(prices)
+            return self.compute_signals(prices, sentiment)
+
+        news_signal = STRATEGY_KERNEL(self.prices, self.idx, self.count, self.sum_short, self.sum_long,
+                                      prices, sentiment, self.short_ma, self.long_ma, self.signals)
+        return self.signals, self.short_ma, self.long_ma, news_signal
+
+    def update_price_history(self, prices: np.ndarray):
+        """
+        Appends one sample per symbol (prices aligned with self.symbols) in a single
+        vectorized pass. Uninitialized prices (<= 0) are skipped.
+        """
+        rows = np.flatnonzero(prices > 0)
+        pos = self.idx[rows]
+        new_prices = prices[rows]
+
+        # Samples leaving each window. Slots not yet written are still 0.0,
+        # so evicting them during warm-up leaves the sums unchanged.
+        evicted_short = self.prices[rows, (pos - SHORT_WINDOW) % MAX_HISTORY]
+        evicted_long = self.prices[rows, (pos - LONG_WINDOW) % MAX_HISTORY]
+
+        self.prices[rows, pos] = new_prices
+        self.sum_short[rows] += new_prices - evicted_short
+        self.sum_long[rows] += new_prices - evicted_long
+        self.idx[rows] = (pos + 1) % MAX_HISTORY
+        self.count[rows] = np.minimum(self.count[rows] + 1, MAX_HISTORY)
+
+    def compute_signals(self, prices: np.ndarray, sentiment: int):
+        """
+        Combines the MA-crossover and news signals for every symbol in one pass.
+        Returns (final_signal, short_ma, long_ma, news_signal); final_signal holds
+        +1 / -1 / 0 per symbol and is non-zero only where both signals agree.
+        """
+        short_ma = self.sum_short / SHORT_WINDOW
+        long_ma = self.sum_long / LONG_WINDOW
+
+        # 1. Price-based Signal (MA Crossover), only once both windows are full
+        ready = (self.count >= LONG_WINDOW) & (prices > 0)
+        price_signal = np.where(ready, np.sign(short_ma - long_ma), 0).astype(np.int8)
+
+        # 2. News-based Signal
+        news_signal = int(sentiment > BULLISH_THRESHOLD) - int(sentiment < BEARISH_THRESHOLD)
+
+        # 3. Combine Signals
+        final_signal = np.where(price_signal == news_signal, price_signal, 0)
+        return final_signal, short_ma, long_ma, news_signal
 
     def get_ma(self, symbol, window):
-        history = list(self.price_history[symbol])
-        if len(history) < window:
+        i = self.symbol_to_index[symbol]
+        if self.count[i] < window:
             return None
-        return np.mean(history[-window:])
+        if window == SHORT_WINDOW:
+            return float(self.sum_short[i]) / SHORT_WINDOW
+        if window == LONG_WINDOW:
+            return float(self.sum_long[i]) / LONG_WINDOW
+        # Any other window: average the most recent samples straight from the ring
+        pos = int(self.idx[i])
+        return float(self.prices[i].take(range(pos - window, pos), mode='wrap').mean())
 
 
-# Global buffer for news stream
-news_recv_buffer = b''
-
-
-def receive_framed_news_message(sock: socket.socket) -> str:
-    """Receives framed message from the news stream."""
-    global news_recv_buffer
+def receive_news_sentiments(sock: socket.socket, news_buffer: RecvBuffer) -> list:
+    """
+    Drains everything queued on the non-blocking news socket (until EAGAIN)
+    and returns the sentiment of every complete news record received so far.
+    """
+    sentiments = []
 
     while True:
         try:
-            delimiter_pos = news_recv_buffer.find(MESSAGE_DELIMITER)
-            if delimiter_pos != -1:
-                message = news_recv_buffer[:delimiter_pos]
-                news_recv_buffer = news_recv_buffer[delimiter_pos + len(MESSAGE_DELIMITER):]
-                return message.decode('utf-8')
+            n_bytes = news_buffer.recv_into(sock)
+        except BlockingIOError:
+            break  # Socket drained
+        except OSError as e:
+            raise SocketStreamClosed(f"Socket error: {e}")
 
-            chunk = sock.recv(4096)
-            if not chunk:
-                raise SocketStreamClosed("Gateway news stream closed.")
+        if not n_bytes:
+            raise SocketStreamClosed("Gateway news stream closed.")
 
-            news_recv_buffer += chunk
+        records = news_buffer.take_records(NEWS_RECORD_STRUCT.size)
+        sentiments.extend(sentiment for (sentiment,) in NEWS_RECORD_STRUCT.iter_unpack(records))
 
-        except Exception as e:
-            raise SocketStreamClosed(f"Socket error: {e}")
+    return sentiments
+
+
+def _wait_for_input(poller, sockets: list) -> set:
+    """Blocks until one of the Gateway sockets becomes readable and returns the ready fds."""
+    if poller is not None:
+        return {fd for fd, _ in poller.poll()}
+    # No epoll on this platform (e.g. macOS)
+    readable, _, _ = select.select(sockets, [], [])
+    return {sock.fileno() for sock in readable}
 
 
-def _send_order(sock: socket.socket, order: dict):
-    """Helper to serialize and send an order to OrderManager."""
+def _log_sent_order(order: dict):
+    """Logs an order handed to OrderManager."""
+    print(
+        f"[STRATEGY|SENT] Order {order['order_id']}: {order['side']} {order['quantity']} {order['symbol']} @ {order['price']:.2f}")
+
+
+def _send_orders(sock: socket.socket, orders: list):
+    """Helper to serialize a tick's orders and send them to OrderManager in one vectored write."""
     try:
-        message_data = json.dumps(order)
-        full_message = message_data.encode('utf-8') + MESSAGE_DELIMITER
-        sock.sendall(full_message)
-        print(
-            f"[STRATEGY|SENT] Order {order['order_id']}: {order['side']} {order['quantity']} {order['symbol']} @ {order['price']:.2f}")
+        buffers = []
+        for order in orders:
+            buffers.append(encode_order(order))
+            buffers.append(MESSAGE_DELIMITER)
+
+        sent = sock.sendmsg(buffers)
+        total = sum(len(buf) for buf in buffers)
+        if sent < total:
+            # Partial write (socket buffer full): push the remainder out
+            sock.sendall(b''.join(buffers)[sent:])
+
+        for order in orders:
+            _log_sent_order(order)
     except Exception as e:
-        print(f"[STRATEGY|ERROR] Failed to send order {order['order_id']} to OrderManager: {e}", file=sys.stderr)
+        order_ids = [order['order_id'] for order in orders]
+        print(f"[STRATEGY|ERROR] Failed to send orders {order_ids} to OrderManager: {e}", file=sys.stderr)
+
+
+def _publish_orders(order_ring: SharedOrderRing, orders: list):
+    """Helper to hand a tick's orders to OrderManager through the shared-memory order ring."""
+    published = order_ring.publish_many(orders)
+    for order in orders[:published]:
+        _log_sent_order(order)
+    for order in orders[published:]:
+        print(f"[STRATEGY|ERROR] Order ring full, dropped order {order['order_id']}.", file=sys.stderr)
+
+
+def _close_gateway_sockets(*sockets: socket.socket):
+    """Closes the Gateway sockets (closing an fd also drops it from the epoll set)."""
+    for sock in sockets:
+        sock.close()
+
+
+def _on_news_tick(pid: int, sentiment: int, current_prices: np.ndarray, state: StrategyState) -> list:
+    """
+    Runs the strategy for one news tick against the latest in-process prices.
+    Returns the orders it generated.
+    """
+    # --- B/C. Record Market Data and Determine Trading Signal (all symbols at once) ---
+    final_signal, short_ma, long_ma, news_signal = state.step(current_prices, sentiment)
 
+    # --- D. Order Generation (only symbols with a signal) ---
+    orders = []
+    for i in np.flatnonzero(final_signal).tolist():
+        symbol = state.symbols[i]
+        signal = int(final_signal[i])
+        side = SIGNAL_NAMES[signal]
 
-def run_strategy(shm_name: str, shm_lock: mp.Lock, symbols: list):
+        # Log signal derivation
+        print(
+            f"[{pid}|{symbol}] SENTIMENT:{sentiment} (News:{SIGNAL_NAMES[news_signal]}) | MA_S:{short_ma[i]:.2f} MA_L:{long_ma[i]:.2f} (Price:{side}) -> FINAL:{side}")
+
+        # Only act if position is NONE or we want to reverse
+        if state.position[i] != signal:
+            order = {
+                'order_id': state.order_counter,
+                'symbol': symbol,
+                'side': side,
+                'quantity': 10,
+                'price': float(current_prices[i]),
+                'timestamp': time.time()
+            }
+            orders.append(order)
+            state.position[i] = signal
+            state.order_counter += 1
+
+    return orders
+
+
+def run_strategy(shm_name: str, symbols: list, order_ring_name: Optional[str] = None,
+                 core_id: Optional[int] = None):
     """
-    Connects to the Gateway news stream and OrderManager.
-    Reads shared memory and generates trading signals.
+    Connects to the Gateway price and news streams and to OrderManager.
+    Price ticks are handled in-process (no OrderBook hop) and also published to
+    the SharedPriceBook, of which the Strategy is the single writer.
+    News ticks generate trading signals.
+    Orders go through the shared-memory order ring when order_ring_name is given,
+    otherwise over the OrderManager TCP socket.
     """
     pid = os.getpid()
     print(f"[STRATEGY|PID:{pid}] Starting Strategy...")
 
+    if pin_to_core(core_id, nice_increment=-10):
+        print(f"[{pid}] Pinned to core {core_id}.")
+
     # 1. Attach to shared memory
     shm_book: Optional[SharedPriceBook] = None
     try:
-        shm_book = SharedPriceBook(symbols=symbols, shm_name=shm_name, lock=shm_lock, create=False)
+        shm_book = SharedPriceBook(symbols=symbols, shm_name=shm_name, create=False)
     except FileNotFoundError:
         print(f"[{pid}] Fatal: Shared memory '{shm_name}' not found. Exiting.", file=sys.stderr)
         return
 
-    # Initialize Strategy State
-    state = StrategyState(symbols)
+    # Initialize Strategy State (rows follow the price book's symbol order)
+    state = StrategyState(shm_book.symbols)
+
+    # Compile (or load from cache) the strategy kernel now rather than on the first tick
+    if STRATEGY_KERNEL is not None:
+        StrategyState(shm_book.symbols).step(np.ones(len(shm_book.symbols)), 50)
+        print(f"[{pid}] Strategy kernel compiled with numba.")
 
     # OrderManager socket is created once and reused
     om_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # Flush each tick's batched orders immediately instead of waiting on Nagle
+    set_low_latency_options(om_socket)
     om_connected = False
 
+    # Prefer the shared-memory order ring; the socket is only the fallback path
+    order_ring: Optional[SharedOrderRing] = None
+    if order_ring_name is not None:
+        try:
+            order_ring = SharedOrderRing(shm_name=order_ring_name, create=False)
+            om_connected = True  # No TCP connection needed
+        except FileNotFoundError:
+            print(f"[{pid}] Order ring '{order_ring_name}' not found. Falling back to TCP.", file=sys.stderr)
+
+    if order_ring is not None:
+        submit_orders = partial(_publish_orders, order_ring)
+    else:
+        submit_orders = partial(_send_orders, om_socket)
+
+    # Preallocated receive buffers for the price and news streams
+    news_buffer = RecvBuffer()
+    price_reader = PriceRecordReader(price_record_size(len(symbols)))
+    tick_prices = np.frombuffer(price_reader.latest, dtype=PRICE_WIRE_DTYPE)  # Gateway symbol order
+    book_order = np.array([symbols.index(sym) for sym in shm_book.symbols])
+    current_prices = np.zeros(len(book_order), dtype=np.float64)  # Price book symbol order
+
+    # Edge-triggered epoll on both Gateway sockets where available (Linux)
+    poller = select.epoll() if hasattr(select, 'epoll') else None
+
     # 2. Main loop for news stream connection/reconnection
     while True:
         # Connect to OrderManager if not connected
@@ -121,110 +359,79 @@ def run_strategy(shm_name: str, shm_lock: mp.Lock, symbols: list):
                 time.sleep(1)
                 continue
 
-        # Connect to Gateway News Stream
+        # Connect to Gateway Price and News Streams
+        price_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         news_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        set_low_latency_options(price_socket)
+        set_low_latency_options(news_socket)
         try:
+            print(f"[{pid}] Attempting to connect to Gateway Price Stream at {HOST}:{GATEWAY_PRICE_PORT}...")
+            price_socket.connect((HOST, GATEWAY_PRICE_PORT))
+            print(f"[{pid}] Connected to Gateway Price Stream.")
             print(f"[{pid}] Attempting to connect to Gateway News Stream at {HOST}:{GATEWAY_NEWS_PORT}...")
             news_socket.connect((HOST, GATEWAY_NEWS_PORT))
             print(f"[{pid}] Connected to Gateway News Stream.")
 
-            global news_recv_buffer
-            news_recv_buffer = b''
+            # Clear buffers on fresh connection
+            price_reader.reset()
+            news_buffer.reset()
+
+            # 3. Strategy execution loop: sleep in epoll until a tick arrives, then drain the ready sockets
+            price_fd = price_socket.fileno()
+            news_fd = news_socket.fileno()
+            for sock in (price_socket, news_socket):
+                sock.setblocking(False)
+                if poller is not None:
+                    poller.register(sock.fileno(), select.EPOLLIN | select.EPOLLET)
 
-            # 3. Strategy execution loop
             while True:
-                # --- A. Receive News Tick (Driving factor) ---
+                ready = _wait_for_input(poller, [price_socket, news_socket])
+
+                # --- A. Price Ticks: keep the newest snapshot and publish it to the book ---
+                if price_fd in ready:
+                    try:
+                        if price_reader.drain_latest(price_socket):
+                            np.take(tick_prices, book_order, out=current_prices)
+                            shm_book.update_many(current_prices)
+                    except SocketStreamClosed:
+                        raise SocketStreamClosed("Price stream failed. Reconnecting...")
+
+                # --- A. News Ticks (Driving factor) ---
+                if news_fd not in ready:
+                    continue
                 try:
-                    raw_news = receive_framed_news_message(news_socket)
-                    sentiment = json.loads(raw_news)
+                    sentiments = receive_news_sentiments(news_socket, news_buffer)
                 except SocketStreamClosed:
                     raise SocketStreamClosed("News stream failed. Reconnecting...")
 
-                # --- B. Read Market Data from Shared Memory ---
-                current_ticks = shm_book.read_all()
-                state.update_price_history(current_ticks)
-
-                # --- C. Determine Trading Signal ---
-                for symbol, current_price in current_ticks.items():
-                    if current_price == 0.0:
-                        continue  # Skip if price hasn't been initialized
-
-                    # 1. Price-based Signal (MA Crossover)
-                    short_ma = state.get_ma(symbol, SHORT_WINDOW)
-                    long_ma = state.get_ma(symbol, LONG_WINDOW)
-
-                    price_signal = 'NEUTRAL'
-                    if short_ma and long_ma:
-                        if short_ma > long_ma:
-                            price_signal = 'BUY'
-                        elif short_ma < long_ma:
-                            price_signal = 'SELL'
-
-                    # 2. News-based Signal
-                    news_signal = 'NEUTRAL'
-                    if sentiment > BULLISH_THRESHOLD:
-                        news_signal = 'BUY'
-                    elif sentiment < BEARISH_THRESHOLD:
-                        news_signal = 'SELL'
-
-                    # 3. Combine Signals
-                    final_signal = 'NEUTRAL'
-                    if price_signal == 'BUY' and news_signal == 'BUY':
-                        final_signal = 'BUY'
-                    elif price_signal == 'SELL' and news_signal == 'SELL':
-                        final_signal = 'SELL'
-
-                    # --- D. Order Generation ---
-
-                    # Log signal derivation
-                    if final_signal != 'NEUTRAL':
-                        print(
-                            f"[{pid}|{symbol}] SENTIMENT:{sentiment} (News:{news_signal}) | MA_S:{short_ma:.2f} MA_L:{long_ma:.2f} (Price:{price_signal}) -> FINAL:{final_signal}")
-
-                    # Only act if position is NONE or we want to reverse
-                    if final_signal == 'BUY' and state.position[symbol] != 'LONG':
-                        order = {
-                            'order_id': state.order_counter,
-                            'symbol': symbol,
-                            'side': 'BUY',
-                            'quantity': 10,
-                            'price': current_price,
-                            'timestamp': time.time()
-                        }
-                        _send_order(om_socket, order)  # Corrected call: removed self.
-                        state.position[symbol] = 'LONG'
-                        state.order_counter += 1
-
-                    elif final_signal == 'SELL' and state.position[symbol] != 'SHORT':
-                        order = {
-                            'order_id': state.order_counter,
-                            'symbol': symbol,
-                            'side': 'SELL',
-                            'quantity': 10,
-                            'price': current_price,
-                            'timestamp': time.time()
-                        }
-                        _send_order(om_socket, order)  # Corrected call: removed self.
-                        state.position[symbol] = 'SHORT'
-                        state.order_counter += 1
-
-                time.sleep(0.01)  # Short delay to prevent busy-waiting
+                # --- B-D. Evaluate every tick drained on this wakeup ---
+                pending_orders = []
+                for sentiment in sentiments:
+                    pending_orders.extend(_on_news_tick(pid, sentiment, current_prices, state))
+
+                # Submit every order generated on this wakeup in one batch
+                if pending_orders:
+                    submit_orders(pending_orders)
 
         except SocketStreamClosed as e:
             print(f"[{pid}] Connection Error: {e}")
-            news_socket.close()
+            _close_gateway_sockets(price_socket, news_socket)
             time.sleep(2)  # Wait before attempting reconnection
         except ConnectionRefusedError:
-            print(f"[{pid}] News Gateway Refused. Retrying in 2s...")
-            news_socket.close()
+            print(f"[{pid}] Gateway Refused. Retrying in 2s...")
+            _close_gateway_sockets(price_socket, news_socket)
             time.sleep(2)
         except Exception as e:
             print(f"[{pid}] Unexpected Error in Strategy loop: {e}", file=sys.stderr)
-            news_socket.close()
+            _close_gateway_sockets(price_socket, news_socket)
             time.sleep(2)
 
     # Cleanup
+    if poller is not None:
+        poller.close()
     om_socket.close()
+    if order_ring is not None:
+        order_ring.cleanup()
     close_shared_price_book(shm_book)
 
 
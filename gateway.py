@@ -2,21 +2,71 @@ import socket
 import time
 import random
 import multiprocessing as mp
-import json
 import os
 import sys
+import numpy as np
+from typing import Optional
+from shared_memory_utils import NEWS_RECORD_STRUCT, PRICE_WIRE_DTYPE, set_low_latency_options, pin_to_core
 
 # Configuration constants (will be imported from main)
 GATEWAY_PRICE_PORT = 8000
 GATEWAY_NEWS_PORT = 8001
 MESSAGE_DELIMITER = b'\n'
-SYMBOLS = ["AAPL", "MSFT", "GOOGL"]
-
-
-def price_streamer():
+# Sorted once at import: the Gateway streams prices in the same order as SharedPriceBook.symbols
+SYMBOLS = tuple(sorted(["AAPL", "MSFT", "GOOGL"]))
+
+PRICE_TICK_INTERVAL = 0.01  # 100 ticks/s
+NEWS_TICK_INTERVAL = 0.5
+
+# Every possible news message (sentiment 0-100), packed once at import
+NEWS_FRAMES = tuple(NEWS_RECORD_STRUCT.pack(sentiment) for sentiment in range(101))
+
+
+class TickTimer:
+    """
+    Fixed-period timer on absolute deadlines, so per-tick work does not push
+    later ticks back (no drift). Uses a kernel timerfd where available
+    (Linux, Python 3.13+): one read per tick blocks until the next boundary.
+    Elsewhere it sleeps until the next deadline on the monotonic clock.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.fd = None
+        if hasattr(os, 'timerfd_create'):
+            self.fd = os.timerfd_create(time.CLOCK_MONOTONIC)
+            os.timerfd_settime(self.fd, initial=interval, interval=interval)
+        else:
+            self.next_deadline = time.monotonic() + interval
+
+    def wait(self) -> int:
+        """Blocks until the next tick boundary. Returns the number of periods elapsed (>1 if ticks were missed)."""
+        if self.fd is not None:
+            return int.from_bytes(os.read(self.fd, 8), sys.byteorder)
+
+        remaining = self.next_deadline - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+            elapsed = 1
+        else:
+            # Fell behind: skip the missed ticks instead of bursting to catch up
+            elapsed = 1 + int(-remaining // self.interval)
+        self.next_deadline += elapsed * self.interval
+        return elapsed
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def price_streamer(core_id: Optional[int] = None):
     """Server stream for price data (connected to OrderBook)."""
+    if pin_to_core(core_id):
+        print(f"[GATEWAY|PRICE] Pinned to core {core_id}.")
+
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    set_low_latency_options(server_socket)
 
     # Use 127.0.0.1 for local communication
     host = '127.0.0.1'
@@ -30,34 +80,32 @@ def price_streamer():
         return
 
     # Simulate price history for random walk
-    current_prices = {sym: random.uniform(100.0, 500.0) for sym in SYMBOLS}
+    rng = np.random.default_rng()
+    # Binary price tick: the raw bytes of this PRICE_WIRE_DTYPE array, in SYMBOLS order
+    # (one little-endian float64 per symbol; fixed width, so self-framing)
+    current_prices = rng.uniform(100.0, 500.0, len(SYMBOLS)).astype(PRICE_WIRE_DTYPE)
 
     while True:
         try:
             # Wait for OrderBook to connect
             client_socket, addr = server_socket.accept()
+            set_low_latency_options(client_socket)
             print(f"[GATEWAY|PRICE] Accepted connection from OrderBook: {addr}")
+            timer = TickTimer(PRICE_TICK_INTERVAL)
 
             while True:
-                # 1. Generate new prices (random walk)
-                message = ""
-                for symbol in SYMBOLS:
-                    # Random walk: +/-(0% to 0.1%)
-                    change = (random.random() - 0.5) * 0.002
-                    current_prices[symbol] *= (1 + change)
-                    current_prices[symbol] = round(current_prices[symbol], 2)
-
-                    # Format message: "SYMBOL,PRICE"
-                    message += f"{symbol},{current_prices[symbol]:.2f}"
+                # 1. Generate new prices (random walk: +/-(0% to 0.1%), all symbols at once)
+                # No rounding: the binary record carries the full float64
+                current_prices *= 1.0 + (rng.random(len(SYMBOLS)) - 0.5) * 0.002
 
-                # 2. Add delimiter and encode
-                full_message = message.encode('utf-8') + MESSAGE_DELIMITER
+                # 2. The price array's raw bytes are the fixed-width binary record
+                full_message = current_prices.tobytes()
 
                 # 3. Send the message
                 client_socket.sendall(full_message)
 
-                # Sleep for 10ms to simulate tick rate
-                time.sleep(0.01)
+                # Wait for the next 10ms boundary to simulate tick rate
+                timer.wait()
 
         except ConnectionResetError:
             print("[GATEWAY|PRICE] OrderBook disconnected. Waiting for reconnection...")
@@ -67,12 +115,19 @@ def price_streamer():
         except Exception as e:
             print(f"[GATEWAY|PRICE] An unexpected error occurred: {e}", file=sys.stderr)
             time.sleep(1)  # Backoff before retrying
+        finally:
+            if 'timer' in locals():
+                timer.close()
 
 
-def news_streamer():
+def news_streamer(core_id: Optional[int] = None):
     """Server stream for news sentiment data (connected to Strategy)."""
+    if pin_to_core(core_id):
+        print(f"[GATEWAY|NEWS] Pinned to core {core_id}.")
+
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    set_low_latency_options(server_socket)
     host = '127.0.0.1'
 
     try:
@@ -87,21 +142,19 @@ def news_streamer():
         try:
             # Wait for Strategy to connect
             client_socket, addr = server_socket.accept()
+            set_low_latency_options(client_socket)
             print(f"[GATEWAY|NEWS] Accepted connection from Strategy: {addr}")
+            timer = TickTimer(NEWS_TICK_INTERVAL)
 
             while True:
                 # 1. Generate random news sentiment (0-100)
                 sentiment = random.randint(0, 100)
 
-                # 2. Serialize and frame: JSON int is simple and clear
-                message_data = json.dumps(sentiment)
-                full_message = message_data.encode('utf-8') + MESSAGE_DELIMITER
-
-                # 3. Send the message
-                client_socket.sendall(full_message)
+                # 2. Send its precomputed fixed-width int32 record (no serialization per tick)
+                client_socket.sendall(NEWS_FRAMES[sentiment])
 
                 # News update frequency is slower (e.g., 500ms)
-                time.sleep(0.5)
+                timer.wait()
 
         except ConnectionResetError:
             print("[GATEWAY|NEWS] Strategy disconnected. Waiting for reconnection...")
@@ -110,18 +163,25 @@ def news_streamer():
         except Exception as e:
             print(f"[GATEWAY|NEWS] An unexpected error occurred: {e}", file=sys.stderr)
             time.sleep(1)
+        finally:
+            if 'timer' in locals():
+                timer.close()
 
 
-def run_gateway():
-    """Starts the Gateway process with two concurrent streams (price and news)."""
+def run_gateway(price_core: Optional[int] = None, news_core: Optional[int] = None):
+    """
+    Starts the Gateway process with two concurrent streams (price and news).
+    :param price_core: CPU core to pin the price streamer to (None = unpinned)
+    :param news_core: CPU core to pin the news streamer to (None = unpinned)
+    """
     print(f"[GATEWAY|PID:{os.getpid()}] Starting Gateway...")
 
     # Use multiprocessing Process for true concurrency (not threads within a single process)
     # However, since the assignment specifies a single Gateway process, we can use threads
     # for the two independent socket streams within the Gateway's main function.
 
-    price_process = mp.Process(target=price_streamer)
-    news_process = mp.Process(target=news_streamer)
+    price_process = mp.Process(target=price_streamer, args=(price_core,))
+    news_process = mp.Process(target=news_streamer, args=(news_core,))
 
     price_process.start()
     news_process.start()
@@ -3,20 +3,38 @@ import time
 import os
 import signal
 import sys
+import logging
 from typing import List, Optional
 
 # Import components
-from gateway import run_gateway
-from OrderBook import run_orderbook
+from gateway import run_gateway, SYMBOLS  # Same (pre-sorted) order the Gateway streams prices in
 from Strategy import run_strategy
 from OrderManager import run_ordermanager
-from shared_memory_utils import SharedPriceBook, close_shared_price_book
+from shared_memory_utils import SharedPriceBook, SharedOrderRing, close_shared_price_book
 
-SYMBOLS = ["AAPL", "MSFT", "GOOGL"]
 SHM_NAME = "trading_shm_book"
+ORDER_RING_NAME = "trading_shm_orders"
 
+# One dedicated CPU core per hot process (shard-per-core), in this order
+PINNED_ROLES = ("gateway_price", "gateway_news", "strategy", "ordermanager")
 
-def cleanup_processes(processes: List[mp.Process], shm_book: Optional[SharedPriceBook]):
+
+def plan_core_assignment(roles=PINNED_ROLES) -> dict:
+    """
+    Maps each role to its own CPU core from the cores this process may run on.
+    Every role maps to None (unpinned) if there are fewer cores than roles or
+    the platform has no sched_getaffinity (e.g. macOS).
+    """
+    if not hasattr(os, 'sched_getaffinity'):
+        return dict.fromkeys(roles)
+    cores = sorted(os.sched_getaffinity(0))
+    if len(cores) < len(roles):
+        return dict.fromkeys(roles)
+    return dict(zip(roles, cores))
+
+
+def cleanup_processes(processes: List[mp.Process], shm_book: Optional[SharedPriceBook],
+                      order_ring: Optional[SharedOrderRing] = None):
     """Terminates processes and cleans up shared memory."""
     print("\n[MAIN] Shutting down system components...")
 
@@ -38,29 +56,44 @@ def cleanup_processes(processes: List[mp.Process], shm_book: Optional[SharedPric
         except Exception as e:
             print(f"[MAIN|ERROR] Error during SharedPriceBook cleanup: {e}", file=sys.stderr)
 
+    if order_ring:
+        order_ring.cleanup()
+
     print("[MAIN] System shutdown complete.")
 
 
 def run_system():
     """Initializes shared memory, launches all processes, and waits for termination."""
+    # Library modules log through `logging`; forked children inherit this configuration
+    logging.basicConfig(level=logging.INFO, format="[%(process)d] %(message)s")
 
-    # 1. Initialize Shared Resources
-    shm_lock = mp.Lock()
+    # 1. Initialize Shared Resources (the price book is seqlock-protected, no mp.Lock needed)
     shm_book: Optional[SharedPriceBook] = None
 
     try:
         # Create and initialize the SharedPriceBook
-        shm_book = SharedPriceBook(symbols=SYMBOLS, shm_name=SHM_NAME, lock=shm_lock, create=True)
+        shm_book = SharedPriceBook(symbols=SYMBOLS, shm_name=SHM_NAME, create=True)
     except Exception as e:
         print(f"[MAIN] Fatal error during SharedPriceBook creation: {e}", file=sys.stderr)
         return
 
-    # 2. Define Processes
+    order_ring: Optional[SharedOrderRing] = None
+    try:
+        # Create the Strategy -> OrderManager order ring
+        order_ring = SharedOrderRing(shm_name=ORDER_RING_NAME, create=True)
+    except Exception as e:
+        print(f"[MAIN] Fatal error during SharedOrderRing creation: {e}", file=sys.stderr)
+        shm_book.cleanup()
+        return
+
+    # 2. Define Processes (each hot process gets its own core when enough are available)
+    cores = plan_core_assignment()
+    print(f"[MAIN] Core assignment: {cores}")
     processes = [
-        mp.Process(target=run_gateway, name="Gateway"),
-        mp.Process(target=run_orderbook, args=(SHM_NAME, shm_lock, SYMBOLS), name="OrderBook"),
-        mp.Process(target=run_strategy, args=(SHM_NAME, shm_lock, SYMBOLS), name="Strategy"),
-        mp.Process(target=run_ordermanager, name="OrderManager"),
+        mp.Process(target=run_gateway, args=(cores["gateway_price"], cores["gateway_news"]), name="Gateway"),
+        mp.Process(target=run_strategy, args=(SHM_NAME, SYMBOLS, ORDER_RING_NAME, cores["strategy"]),
+                   name="Strategy"),
+        mp.Process(target=run_ordermanager, args=(ORDER_RING_NAME, cores["ordermanager"]), name="OrderManager"),
     ]
 
     # 3. Start Processes (in reverse order for dependencies to start listening first)
@@ -72,8 +105,8 @@ def run_system():
     # 4. Handle Shutdown (SIGINT/Ctrl+C)
     def signal_handler(sig, frame):
         print("\n[MAIN] Ctrl+C received. Initiating shutdown...")
-        # Pass the created shm_book object to cleanup
-        cleanup_processes(processes, shm_book)
+        # Pass the created shared memory objects to cleanup
+        cleanup_processes(processes, shm_book, order_ring)
         sys.exit(0)
 
     signal.signal(signal.SIGINT, signal_handler)
@@ -86,10 +119,10 @@ def run_system():
         pass
     except Exception as e:
         print(f"\n[MAIN] Unexpected exception: {e}")
-        cleanup_processes(processes, shm_book)
+        cleanup_processes(processes, shm_book, order_ring)
 
     # Final cleanup if loop exited for other reasons
-    cleanup_processes(processes, shm_book)
+    cleanup_processes(processes, shm_book, order_ring)
 
 
 if __name__ == "__main__":
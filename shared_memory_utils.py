@@ -1,79 +1,266 @@
-import multiprocessing as mp
 from multiprocessing.shared_memory import SharedMemory, resource_tracker
 import numpy as np
 import os
 import sys
 import atexit
+import json
+import logging
+import mmap
+import socket
+import struct
+import threading
+import time
+from typing import Optional
 
-SHM_DTYPE = np.dtype([('symbol','U10'),('price','f8')])
+# Lifecycle messages (create/attach/close) go through logging: formatted lazily, and
+# the process id comes from the record (%(process)d) rather than os.getpid() per line
+_log = logging.getLogger(__name__)
+
+try:
+    import orjson  # Optional C-accelerated JSON codec
+except ImportError:
+    orjson = None
+
+# Prices are stored as a contiguous float64 array (struct-of-arrays). Symbols never
+# change, so they live only in process memory (sorted, index = position in the array).
+PRICE_DTYPE = np.dtype(np.float64)
+PRICE_ITEMSIZE = PRICE_DTYPE.itemsize
+
+# Shared memory layout, every region starting on its own 64-byte cache line:
+#   offset 0:  uint64 seq + 56B pad
+#   offset 64: float64 prices[N], padded to the next cache line
+#   then:      one uint64 last-seen seq per reader, each on its own cache line
+# Keeping the sequence counter, the prices and each reader's state on separate lines
+# stops readers polling the counter from contending with the line the writer stores
+# prices into, and readers from invalidating each other's lines.
+CACHE_LINE_SIZE = 64
+SEQ_DTYPE = np.dtype(np.uint64)
+MAX_PRICE_BOOK_READERS = 4
+# Seqlock readers retry this many times before yielding the CPU (the writer may be descheduled mid-update)
+SEQLOCK_SPIN_LIMIT = 100
+_yield_cpu = getattr(os, 'sched_yield', lambda: time.sleep(0))
+READER_REGION_SIZE = MAX_PRICE_BOOK_READERS * CACHE_LINE_SIZE
+
+def pad_to_cache_line(num_bytes: int) -> int:
+    """Rounds num_bytes up to a whole number of cache lines."""
+    return -(-num_bytes // CACHE_LINE_SIZE) * CACHE_LINE_SIZE
+
+def price_book_layout(num_symbols: int) -> tuple:
+    """Returns (readers_offset, buffer_size) of a SharedPriceBook holding num_symbols prices."""
+    readers_offset = CACHE_LINE_SIZE + pad_to_cache_line(num_symbols * PRICE_ITEMSIZE)
+    return readers_offset, readers_offset + READER_REGION_SIZE
+
+# Segments attached (not created) by this process: shm_name -> [SharedMemory, refcount].
+# Every SharedPriceBook attaching the same name shares one fd and one mmap.
+_ATTACH_CACHE = {}
+_ATTACH_LOCK = threading.Lock()
+
+def _attach_shared_memory(shm_name: str) -> SharedMemory:
+    """Returns this process's mapping of shm_name, attaching it on first use."""
+    with _ATTACH_LOCK:
+        entry = _ATTACH_CACHE.get(shm_name)
+        if entry is None:
+            entry = _ATTACH_CACHE[shm_name] = [SharedMemory(name=shm_name, create=False), 0]
+            _prefault_hint(entry[0])
+        entry[1] += 1
+        return entry[0]
+
+def _prefault_hint(shm: SharedMemory):
+    """
+    Asks the kernel to bring a freshly attached segment's pages in now
+    (MADV_WILLNEED), so a reader's first snapshot does not take the page-fault path.
+    Best effort: skipped where madvise is unavailable (e.g. Windows, older Pythons).
+    """
+    if hasattr(mmap, 'MADV_WILLNEED'):
+        try:
+            shm._mmap.madvise(mmap.MADV_WILLNEED)
+        except (AttributeError, OSError):
+            pass
+
+def _detach_shared_memory(shm: SharedMemory):
+    """Drops one reference to an attached segment; the mapping is closed with the last one."""
+    with _ATTACH_LOCK:
+        entry = _ATTACH_CACHE.get(shm.name)
+        if entry is None or entry[0] is not shm:
+            shm.close()  # Not from the cache
+            return
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _ATTACH_CACHE[shm.name]
+            shm.close()
 
 class SharedPriceBook:
     """
-    Manages access to market data (symbol, price) stored in shared memory
-    and synchronized with a lock.
+    Manages access to market data stored in shared memory: one float64 price per
+    symbol, indexed by the symbol's position in the sorted self.symbols.
+
+    Synchronization is a seqlock: the (single) writer makes the sequence counter
+    odd while it stores prices and even again once done; readers copy the prices
+    and retry if the counter was odd or moved underneath them. Neither side takes
+    a lock or makes a syscall. There must be exactly one writer process, so there
+    is nothing to arbitrate and no CAS/futex writer lock is needed either. This
+    relies on stores becoming visible in program order, which holds on x86-64 (TSO).
     """
-    def __init__(self, symbols: list, shm_name: str, lock: mp.Lock, create: bool = False):
+    def __init__(self, symbols: list, shm_name: str, create: bool = False):
         """
         Initializes the SharedPriceBook.
-        :param symbols: List of symbols to track (e.g., ["AAPL", "MSFT"]).
+        :param symbols: Symbols to track (e.g., ["AAPL", "MSFT"]). Always sorted, so every
+                        process maps the same index to the same symbol whatever order it passes.
         :param shm_name: The name of the shared memory block.
-        :param lock: A multiprocessing.Lock instance for synchronization.
         :param create: If True, creates and initializes the shared memory block.
         """
-        self.symbols = sorted(symbols)
+        # Interned so lookups with the (equally interned) literal symbols hit the identity fast path
+        self.symbols = tuple(sys.intern(sym) for sym in sorted(symbols))
         self.shm_name = shm_name
-        self.lock = lock
         self.size = len(self.symbols)
+        # Computed once here; attaching processes derive the same layout from the symbol count
+        self.readers_offset, self.buffer_size = price_book_layout(self.size)
         self.shm = None
-        self.data_array = None
+        self.seq = None
+        self.prices = None
+        self.reader_seqs = None
+        self._seq_slot = None
+        self._price_slots = None
         self.symbol_to_index = {sym: i for i, sym in enumerate(self.symbols)}
+        self._get_index = self.symbol_to_index.__getitem__  # Bound once, saves an attribute lookup per update
 
         try:
             if create:
                 self.is_creator = True
-                buffer_size = self.size * SHM_DTYPE.itemsize
-                self.shm = SharedMemory(name=self.shm_name, create=True, size=buffer_size)
-                self.data_array = np.ndarray(self.size, dtype=SHM_DTYPE, buffer=self.shm.buf)
-                # Initialize symbols and set initial prices to 0.0
-                initial_data = [(sym, 0.0) for sym in self.symbols]
-                self.data_array[:] = np.array(initial_data, dtype=SHM_DTYPE)
-                print(f"[{os.getpid()}] SharedPriceBook created (Size: {buffer_size} bytes)")
+                self.shm = SharedMemory(name=self.shm_name, create=True, size=self.buffer_size)
+                self._map_views()
+                # Set initial prices to 0.0 (uninitialized)
+                self.prices.fill(0.0)
+                _log.info("SharedPriceBook created (Size: %d bytes)", self.buffer_size)
                 atexit.register(self.cleanup)
             else:
                 self.is_creator = False
-                # Attach to an existing shared memory block
-                self.shm = SharedMemory(name=self.shm_name, create=False)
-                self.data_array = np.ndarray(self.size, dtype=SHM_DTYPE, buffer=self.shm.buf)
-                print(f"[{os.getpid()}] SharedPriceBook attached to existing memory.")
+                # Attach to an existing shared memory block (shared with other instances in this process)
+                self.shm = _attach_shared_memory(self.shm_name)
+                self._map_views()
+                _log.info("SharedPriceBook attached to existing memory.")
 
         except FileNotFoundError:
-            print(f"[{os.getpid()}] Error: Shared memory '{self.shm_name}' not found.", file=sys.stderr)
+            _log.error("Shared memory '%s' not found.", self.shm_name)
             raise
         except Exception as e:
-            print(f"[{os.getpid()}] Error initializing SharedPriceBook: {e}", file=sys.stderr)
+            _log.error("Error initializing SharedPriceBook: %s", e)
             raise
 
+    def _map_views(self):
+        """Maps the sequence counter, the price array and the reader slots onto the shared memory block."""
+        self.seq = np.ndarray(1, dtype=SEQ_DTYPE, buffer=self.shm.buf)
+        self.prices = np.ndarray(self.size, dtype=PRICE_DTYPE, buffer=self.shm.buf, offset=CACHE_LINE_SIZE)
+        # One counter per cache line: stride by a full line between readers
+        self.reader_seqs = np.ndarray(MAX_PRICE_BOOK_READERS, dtype=SEQ_DTYPE, buffer=self.shm.buf,
+                                      offset=self.readers_offset, strides=(CACHE_LINE_SIZE,))
+
+        # Raw typed memoryviews for the single-symbol hot path: item stores on a memoryview
+        # cost about half of NumPy scalar indexing (no scalar boxing / dtype dispatch).
+        # Taken over the arrays rather than shm.buf so they never block shm.close().
+        self._seq_slot = memoryview(self.seq)
+        self._price_slots = memoryview(self.prices)
+
+        # The mapping is page-aligned, so each region must start on a cache line boundary
+        for region in (self.seq, self.prices, self.reader_seqs):
+            if region.ctypes.data % CACHE_LINE_SIZE:
+                raise RuntimeError(f"SharedPriceBook region at {region.ctypes.data:#x} is not cache-line aligned.")
+
     def update(self, symbol: str, price: float):
         """
         Updates the price for a specific symbol in the shared memory.
-        Uses the lock to ensure atomicity.
+        An aligned 8-byte store is atomic on x86-64 and ARMv8, so a reader sees
+        either the old or the new price and never a torn one: no odd (write in
+        progress) phase is needed. The sequence counter is only advanced
+        afterwards, so readers and has_update() notice the change.
         """
-        if symbol not in self.symbol_to_index:
+        try:
+            index = self._get_index(symbol)  # One dict probe
+        except KeyError:
             return
 
-        index = self.symbol_to_index[symbol]
-        with self.lock:
-            # Update only the price field for the symbol's index
-            self.data_array['price'][index] = price
+        self._price_slots[index] = price
+        self._seq_slot[0] += 2  # stays even: the snapshot was never inconsistent
+
+    def update_many(self, prices):
+        """
+        Updates several prices inside a single seqlock write section.
+        :param prices: Either a {symbol: price} dict, or a sequence of prices
+                       aligned with self.symbols (written as one block copy).
+        """
+        if isinstance(prices, dict):
+            known = [(self.symbol_to_index[symbol], price) for symbol, price in prices.items()
+                     if symbol in self.symbol_to_index]
+            if known:
+                indices, values = zip(*known)
+                self.update_indexed(indices, np.asarray(values, dtype=PRICE_DTYPE))
+            return
+
+        # Convert and validate before the write section: an exception inside it
+        # would leave seq odd and every reader spinning forever
+        values = np.asarray(prices, dtype=PRICE_DTYPE)
+        if values.shape != self.prices.shape:
+            raise ValueError(f"Expected {self.size} prices, got shape {values.shape}.")
+
+        self.seq[0] += 1
+        self.prices[:] = values
+        self.seq[0] += 1
+
+    def update_indexed(self, indices, prices):
+        """
+        Applies a batch of (index, price) updates as one vectorized scatter inside a
+        single seqlock write section. Later entries win if an index repeats.
+        :param indices: Positions in self.symbols (e.g. from symbol_to_index).
+        :param prices: New prices, aligned with indices.
+        """
+        # Build and bounds-check both arrays first, so nothing can raise with seq odd
+        index_array = np.asarray(indices, dtype=np.intp)
+        values = np.asarray(prices, dtype=PRICE_DTYPE)
+        if index_array.ndim != 1 or values.shape != index_array.shape:
+            raise ValueError(f"Expected matching 1-D indices and prices, got {index_array.shape} and {values.shape}.")
+        if index_array.size and (index_array.min() < 0 or index_array.max() >= self.size):
+            raise IndexError(f"Price book index out of range 0..{self.size - 1}: {index_array.tolist()}")
+
+        self.seq[0] += 1
+        self.prices[index_array] = values
+        self.seq[0] += 1
+
+    def read_prices(self, reader_id: Optional[int] = None) -> np.ndarray:
+        """
+        Returns a consistent copy of all prices, aligned with self.symbols.
+        Retries until it copies a snapshot no writer touched in the meantime:
+        spins for up to SEQLOCK_SPIN_LIMIT attempts (a write section is a few
+        hundred ns), then yields the CPU between attempts.
+        :param reader_id: Optional reader slot (0..MAX_PRICE_BOOK_READERS-1) in which
+                          to record the sequence number of the snapshot returned.
+        """
+        attempts = 0
+        while True:
+            start = self.seq[0]
+            if not start & 1:  # Even: no write in progress, take a copy
+                prices = self.prices.copy()
+                if self.seq[0] == start:
+                    if reader_id is not None:
+                        self.reader_seqs[reader_id] = start
+                    return prices
+
+            # Odd (writer mid-update) or the seq moved during the copy: retry
+            attempts += 1
+            if attempts >= SEQLOCK_SPIN_LIMIT:
+                _yield_cpu()  # Sustained contention: let the writer run
+
+    def has_update(self, reader_id: int) -> bool:
+        """
+        True if prices changed since reader_id last called read_prices().
+        Only touches the seq line and the reader's own line.
+        """
+        return self.seq[0] != self.reader_seqs[reader_id]
 
     def read_all(self) -> dict:
         """
         Reads all symbol prices from shared memory.
         """
-        with self.lock:
-            # Create a copy of the current state
-            current_state = {row['symbol']: row['price'] for row in self.data_array}
-        return current_state
+        return dict(zip(self.symbols, self.read_prices().tolist()))
 
     def cleanup(self):
         """
@@ -82,24 +269,355 @@ class SharedPriceBook:
         """
         if self.shm:
             try:
-                self.shm.close()
                 if self.is_creator:
+                    self.shm.close()
                     # Attempt to unlink only if this process created it
                     self.shm.unlink()
-                    print(f"\n[{os.getpid()}] Shared memory '{self.shm_name}' unlinked and closed.")
+                    _log.info("Shared memory '%s' unlinked and closed.", self.shm_name)
+                else:
+                    _detach_shared_memory(self.shm)
             except FileNotFoundError:
                 # Catch case where it was already unlinked by a forceful exit
                 pass
             except Exception as e:
                 # Catch other potential errors during cleanup
-                print(f"[{os.getpid()}] Error during final cleanup/unlink: {e}", file=sys.stderr)
+                _log.error("Error during final cleanup/unlink: %s", e)
+            self.shm = None
 
 # Helper function to detach and close (used by client processes)
 def close_shared_price_book(shm_instance: SharedMemory):
     """Closes the shared memory attachment for client processes."""
     if shm_instance and shm_instance.shm:
-        shm_instance.shm.close()
-        print(f"[{os.getpid()}] SharedPriceBook attachment closed.")
+        _detach_shared_memory(shm_instance.shm)
+        shm_instance.shm = None
+        _log.info("SharedPriceBook attachment closed.")
+
+# Wire dtype of Gateway price ticks: little-endian float64 on every host (PRICE_DTYPE above
+# is the native float64 used in shared memory; identical on little-endian machines)
+PRICE_WIRE_DTYPE = np.dtype('<f8')
+
+def price_record_size(num_symbols: int) -> int:
+    """
+    Returns the size in bytes of one Gateway price tick: one PRICE_WIRE_DTYPE
+    value per symbol, in the order the Gateway streams them.
+    """
+    return num_symbols * PRICE_WIRE_DTYPE.itemsize
+
+# Order record: order_id, timestamp (ns), symbol, side (b'B'/b'S'), quantity, price
+ORDER_STRUCT = struct.Struct('<IQ10scId')
+ORDER_SLOT_SIZE = CACHE_LINE_SIZE
+ORDER_RING_CAPACITY = 1024
+# Ring layout: [uint64 head][uint64 capacity][pad to 64B][uint64 tail][pad to 64B][slots]
+# capacity is written once by the creator; attaching processes read it instead of assuming it.
+ORDER_RING_HEADER_SIZE = 2 * CACHE_LINE_SIZE
+ORDER_RING_CAPACITY_OFFSET = SEQ_DTYPE.itemsize
+
+class SharedOrderRing:
+    """
+    Single-producer/single-consumer ring buffer of fixed-size order records
+    in shared memory (Strategy -> OrderManager).
+
+    head is the next slot the consumer reads, tail the next slot the producer
+    writes; both only ever increase and each lives on its own cache line. The
+    producer fills a slot before publishing the new tail, and the consumer
+    reads slots before publishing the new head, so neither side needs a lock.
+    """
+    def __init__(self, shm_name: str, capacity: Optional[int] = None, create: bool = False):
+        """
+        Initializes the SharedOrderRing.
+        :param shm_name: The name of the shared memory block.
+        :param capacity: Number of order slots (must be a power of two). Defaults to
+                         ORDER_RING_CAPACITY when creating; when attaching, the ring's own
+                         capacity is read from its header and must match if given.
+        :param create: If True, creates and initializes the shared memory block.
+        """
+        if create and capacity is None:
+            capacity = ORDER_RING_CAPACITY
+        if capacity is not None and (capacity <= 0 or capacity & (capacity - 1)):
+            raise ValueError(f"Order ring capacity must be a power of two, got {capacity}.")
+        self.shm_name = shm_name
+        self.shm = None
+
+        try:
+            if create:
+                self.is_creator = True
+                buffer_size = ORDER_RING_HEADER_SIZE + capacity * ORDER_SLOT_SIZE
+                self.shm = SharedMemory(name=self.shm_name, create=True, size=buffer_size)
+                _log.info("SharedOrderRing created (Size: %d bytes)", buffer_size)
+                atexit.register(self.cleanup)
+            else:
+                self.is_creator = False
+                self.shm = SharedMemory(name=self.shm_name, create=False)
+                _log.info("SharedOrderRing attached to existing memory.")
+        except FileNotFoundError:
+            _log.error("Shared memory '%s' not found.", self.shm_name)
+            raise
+
+        self.head = np.ndarray(1, dtype=SEQ_DTYPE, buffer=self.shm.buf)
+        self.tail = np.ndarray(1, dtype=SEQ_DTYPE, buffer=self.shm.buf, offset=CACHE_LINE_SIZE)
+        stored_capacity = np.ndarray(1, dtype=SEQ_DTYPE, buffer=self.shm.buf, offset=ORDER_RING_CAPACITY_OFFSET)
+
+        if create:
+            stored_capacity[0] = capacity
+        else:
+            # Producer and consumer must mask slot indices identically
+            ring_capacity = int(stored_capacity[0])
+            if capacity is not None and capacity != ring_capacity:
+                self.cleanup()
+                raise ValueError(f"Order ring '{shm_name}' has capacity {ring_capacity}, not {capacity}.")
+            if ORDER_RING_HEADER_SIZE + ring_capacity * ORDER_SLOT_SIZE > self.shm.size:
+                self.cleanup()
+                raise ValueError(f"Order ring '{shm_name}' header is corrupt (capacity {ring_capacity}).")
+            capacity = ring_capacity
+
+        self.capacity = capacity
+        self.mask = capacity - 1
+
+    def publish(self, order: dict) -> bool:
+        """
+        Writes one order into the next free slot (producer side).
+        Returns False if the ring is full.
+        """
+        return self.publish_many([order]) == 1
+
+    def publish_many(self, orders: list) -> int:
+        """
+        Writes a batch of orders and makes them visible with a single tail store
+        (producer side). Returns how many orders fitted into the ring.
+        """
+        tail = int(self.tail[0])
+        free_slots = self.capacity - (tail - int(self.head[0]))
+        batch = orders[:free_slots]
+
+        for order in batch:
+            ORDER_STRUCT.pack_into(
+                self.shm.buf, ORDER_RING_HEADER_SIZE + (tail & self.mask) * ORDER_SLOT_SIZE,
+                order['order_id'], int(order['timestamp'] * 1e9), order['symbol'].encode('ascii'),
+                order['side'][:1].encode('ascii'), order['quantity'], order['price'])
+            tail += 1
+
+        # Publish only after the slots are fully written
+        self.tail[0] = tail
+        return len(batch)
+
+    def consume(self) -> list:
+        """
+        Drains every published order (consumer side).
+        Returns a list of order dicts, oldest first.
+        """
+        head = int(self.head[0])
+        tail = int(self.tail[0])
+        orders = []
+        while head < tail:
+            order_id, ts_ns, symbol, side, quantity, price = ORDER_STRUCT.unpack_from(
+                self.shm.buf, ORDER_RING_HEADER_SIZE + (head & self.mask) * ORDER_SLOT_SIZE)
+            orders.append({
+                'order_id': order_id,
+                'symbol': symbol.rstrip(b'\0').decode('ascii'),
+                'side': 'BUY' if side == b'B' else 'SELL',
+                'quantity': quantity,
+                'price': price,
+                'timestamp': ts_ns / 1e9
+            })
+            head += 1
+        # Hand the slots back to the producer only after they have been read
+        self.head[0] = head
+        return orders
+
+    def cleanup(self):
+        """
+        Closes the ring and unlinks it if this process created it.
+        """
+        if self.shm:
+            try:
+                self.shm.close()
+                if self.is_creator:
+                    self.shm.unlink()
+                    _log.info("Shared memory '%s' unlinked and closed.", self.shm_name)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                _log.error("Error during final cleanup/unlink: %s", e)
+            self.shm = None
+
+# News tick: one little-endian int32 sentiment score (fixed width, so self-framing)
+NEWS_RECORD_STRUCT = struct.Struct('<i')
+
+def encode_order(order: dict) -> bytes:
+    """Serializes an order to JSON bytes (via orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(order)
+    return json.dumps(order).encode('utf-8')
+
+def decode_order(raw_order) -> dict:
+    """
+    Parses a JSON order from bytes or a memoryview.
+    Raises json.JSONDecodeError (or its orjson subclass) on bad input.
+    """
+    if orjson is not None:
+        return orjson.loads(raw_order)
+    return json.loads(bytes(raw_order))
+
+RECV_BUFFER_SIZE = 1 << 16
+
+class RecvBuffer:
+    """
+    Preallocated socket receive buffer with head/tail indices.
+
+    Bytes are received in place with recv_into and handed out as memoryview
+    slices, so framing allocates nothing per message. Unread bytes are moved
+    back to the front only once head has passed the middle of the buffer.
+    Returned views alias the buffer: consume them before the next recv.
+    """
+    def __init__(self, capacity: int = RECV_BUFFER_SIZE):
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.head = 0
+        self.tail = 0
+
+    def reset(self):
+        """Discards any buffered bytes (e.g. on reconnection)."""
+        self.head = self.tail = 0
+
+    def recv_into(self, sock: socket.socket) -> int:
+        """Receives into the free space after tail. Returns the byte count (0 on EOF)."""
+        if self.head > len(self.buffer) // 2 or self.tail == len(self.buffer):
+            unread = self.tail - self.head
+            self.view[:unread] = self.view[self.head:self.tail]
+            self.head, self.tail = 0, unread
+            if self.tail == len(self.buffer):
+                raise BufferError(f"Message exceeds the {len(self.buffer)}-byte receive buffer.")
+
+        n_bytes = sock.recv_into(self.view[self.tail:])
+        self.tail += n_bytes
+        return n_bytes
+
+    def next_frame(self, delimiter: bytes) -> Optional[memoryview]:
+        """Pops the next delimiter-terminated frame (without the delimiter), or None."""
+        pos = self.buffer.find(delimiter, self.head, self.tail)
+        if pos == -1:
+            return None
+        frame = self.view[self.head:pos]
+        self.head = pos + len(delimiter)
+        return frame
+
+    def take_records(self, record_size: int) -> memoryview:
+        """Pops every complete fixed-width record currently buffered."""
+        end = self.head + (self.tail - self.head) // record_size * record_size
+        records = self.view[self.head:end]
+        self.head = end
+        return records
+
+RECV_BATCH_RECORDS = 64  # Max price ticks drained per recv call
+
+class PriceRecordReader:
+    """
+    Reads fixed-width price records from the Gateway in batches.
+
+    One recv_into drains every tick already queued on the socket (up to
+    batch_records of them). Each record is a full snapshot of all prices, so
+    only the newest complete record is kept; a trailing partial record stays
+    buffered for the next read.
+    """
+    def __init__(self, record_size: int, batch_records: int = RECV_BATCH_RECORDS):
+        self.record_size = record_size
+        self.buffer = bytearray(record_size * batch_records)
+        self.view = memoryview(self.buffer)
+        self.filled = 0
+        self.latest = bytearray(record_size)
+
+    def reset(self):
+        """Drops any partial record (used on reconnection)."""
+        self.filled = 0
+
+    def _consume(self, n_bytes: int) -> bool:
+        """
+        Accounts for n_bytes just received. If they complete at least one record,
+        copies the newest into self.latest and returns True.
+        """
+        self.filled += n_bytes
+        end = (self.filled // self.record_size) * self.record_size
+        if not end:
+            return False
+
+        self.latest[:] = self.view[end - self.record_size:end]
+        # Move the trailing partial record (if any) to the front
+        leftover = self.filled - end
+        self.buffer[:leftover] = self.view[end:self.filled]
+        self.filled = leftover
+        return True
+
+    def _recv(self, sock: socket.socket) -> int:
+        try:
+            n_bytes = sock.recv_into(self.view[self.filled:])
+        except BlockingIOError:
+            raise  # Non-blocking socket drained; handled by drain_latest
+        except OSError as e:
+            raise SocketStreamClosed(f"Socket error: {e}")
+
+        if not n_bytes:
+            # Connection closed
+            raise SocketStreamClosed("Gateway price stream closed.")
+        return n_bytes
+
+    def read_latest(self, sock: socket.socket) -> bytearray:
+        """
+        Blocks until at least one complete record is available and returns
+        self.latest, overwritten with the newest one.
+        """
+        while not self._consume(self._recv(sock)):
+            pass
+        return self.latest
+
+    def drain_latest(self, sock: socket.socket) -> bool:
+        """
+        Non-blocking variant: reads until the socket would block (EAGAIN).
+        Returns True if self.latest now holds a newer record.
+        """
+        updated = False
+        while True:
+            try:
+                n_bytes = self._recv(sock)
+            except BlockingIOError:
+                return updated
+            updated = self._consume(n_bytes) or updated
+
+# Kernel send/receive buffer size for the loopback TCP links
+SOCKET_BUFFER_SIZE = 1 << 20
+
+def set_low_latency_options(sock: socket.socket):
+    """
+    Disables Nagle's algorithm (messages go out immediately instead of being
+    held for coalescing) and enlarges the kernel send/receive buffers so bursts
+    are read without short reads. Call before connect()/listen().
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+
+def pin_to_core(core_id: Optional[int], nice_increment: int = 0) -> bool:
+    """
+    Pins the calling process to a single CPU core so the OS does not migrate it
+    (keeping its L1/L2 working set warm), and once pinned optionally raises its priority
+    (a negative nice_increment needs CAP_SYS_NICE and is silently ignored without it).
+    No-op when core_id is None or the platform lacks sched_setaffinity (e.g. macOS).
+    Returns True if the process was pinned.
+    """
+    pinned = False
+    if core_id is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {core_id})
+            pinned = True
+        except OSError as e:
+            _log.warning("Could not pin to core %s: %s", core_id, e)
+
+    # Only a pinned process is reniced: an unpinned one must not crowd out its neighbours
+    if pinned and nice_increment:
+        try:
+            os.nice(nice_increment)
+        except OSError:
+            pass  # Negative increments need CAP_SYS_NICE; run at normal priority
+    return pinned
 
 # Custom exception for clean socket handling
 class SocketStreamClosed(Exception):
@@ -1,27 +1,42 @@
 import unittest
 import time
 import socket
-import json
+import errno
 import multiprocessing as mp
 import numpy as np
 from multiprocessing.shared_memory import SharedMemory
 
 # Import the core components to test utility functions and connectivity
-from shared_memory_utils import SharedPriceBook, SHM_DTYPE
+from shared_memory_utils import (SharedPriceBook, SharedOrderRing, CACHE_LINE_SIZE, encode_order,
+                                 decode_order, RecvBuffer, PriceRecordReader, SocketStreamClosed,
+                                 PRICE_WIRE_DTYPE, price_record_size)
 from gateway import run_gateway, GATEWAY_PRICE_PORT, GATEWAY_NEWS_PORT, SYMBOLS, MESSAGE_DELIMITER
 from OrderManager import run_ordermanager, ORDER_MANAGER_PORT
+from Strategy import StrategyState, STRATEGY_KERNEL, _strategy_step, MAX_HISTORY
 
 
 # === Helper: wait until a given port is ready (bind + listen complete) ===
 def wait_for_port(port: int, timeout: float = 5.0):
     """Wait until a TCP port on localhost is ready for connection."""
     start = time.time()
-    while time.time() - start < timeout:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(0.5)
-            if s.connect_ex(('127.0.0.1', port)) == 0:
+    delay = 0.001  # Exponential backoff: retry quickly first, then at most every 50ms
+    # One probe socket for every attempt; a refused connect leaves it reusable
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.settimeout(0.5)
+    try:
+        while time.time() - start < timeout:
+            err = s.connect_ex(('127.0.0.1', port))
+            if err == 0:
                 return True
-        time.sleep(0.1)
+            if err != errno.ECONNREFUSED:
+                # Unexpected failure (e.g. timeout): start over with a fresh socket
+                s.close()
+                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                s.settimeout(0.5)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+    finally:
+        s.close()
     raise TimeoutError(f"Port {port} not ready after {timeout} seconds.")
 
 
@@ -30,9 +45,7 @@ class TestTradingSystem(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        """Set up shared memory and lock for testing."""
-        cls.shm_lock = mp.Lock()
-
+        """Set up shared memory for testing (seqlock-protected, no lock needed)."""
         # ---- Cleanup previous leftover shared memory block ----
         try:
             existing = SharedMemory(name=cls.SHM_NAME)
@@ -43,7 +56,7 @@ class TestTradingSystem(unittest.TestCase):
         except Exception:
             pass
 
-        cls.shm_book = SharedPriceBook(symbols=SYMBOLS, shm_name=cls.SHM_NAME, lock=cls.shm_lock, create=True)
+        cls.shm_book = SharedPriceBook(symbols=SYMBOLS, shm_name=cls.SHM_NAME, create=True)
 
     @classmethod
     def tearDownClass(cls):
@@ -126,10 +139,12 @@ class TestTradingSystem(unittest.TestCase):
                 'timestamp': time.time()
             }
 
-            # Strategy logic for sending
-            message_data = json.dumps(test_order)
-            full_message = message_data.encode('utf-8') + MESSAGE_DELIMITER
-            client_sock.sendall(full_message)
+            # Strategy logic for sending (orjson when installed, stdlib json otherwise)
+            message_data = encode_order(test_order)
+            self.assertEqual(decode_order(message_data), test_order, "Order should survive the codec round trip")
+            # Payload and delimiter go out as one gathered write (no concatenated copy)
+            sent = client_sock.sendmsg([message_data, MESSAGE_DELIMITER])
+            self.assertEqual(sent, len(message_data) + len(MESSAGE_DELIMITER))
 
             # Since OrderManager logs the output, we just test successful sending
             self.assertTrue(True, "Order message sent successfully to OrderManager.")
@@ -142,6 +157,206 @@ class TestTradingSystem(unittest.TestCase):
             mock_om_process.terminate()
             mock_om_process.join(timeout=2)
 
+    # ----------------------------------------------------------------------
+    def test_04_shared_memory_batch_update(self):
+        """Tests that update_many / update_indexed write every symbol in one call."""
+        book_prices = [101.0 + i for i in range(len(self.shm_book.symbols))]
+        self.shm_book.update_many(book_prices)
+        self.assertEqual(self.shm_book.read_all(), dict(zip(self.shm_book.symbols, book_prices)))
+
+        self.shm_book.update_many({SYMBOLS[0]: 99.5, "UNKNOWN": 1.0})
+        read_updated = self.shm_book.read_all()
+        self.assertEqual(read_updated[SYMBOLS[0]], 99.5)
+        self.assertNotIn("UNKNOWN", read_updated, "Unknown symbols should be ignored")
+
+        # Batched (index, price) records are scattered in one write section
+        seq_before = int(self.shm_book.seq[0])
+        self.shm_book.update_indexed([2, 0, 2], [7.0, 5.0, 9.0])
+        np.testing.assert_array_equal(self.shm_book.read_prices()[[0, 2]], [5.0, 9.0])
+        self.assertEqual(int(self.shm_book.seq[0]), seq_before + 2)
+
+        # A rejected batch must not leave the seqlock open (odd) for readers
+        prices_before = self.shm_book.read_all()
+        for bad_update in (lambda: self.shm_book.update_indexed([5], [1.0]),
+                           lambda: self.shm_book.update_indexed([0, 1], [1.0]),
+                           lambda: self.shm_book.update_many({SYMBOLS[0]: "n/a"}),
+                           lambda: self.shm_book.update_many([1.0])):
+            with self.assertRaises((IndexError, ValueError)):
+                bad_update()
+            self.assertEqual(int(self.shm_book.seq[0]) % 2, 0)
+        self.assertEqual(self.shm_book.read_all(), prices_before)
+
+    # ----------------------------------------------------------------------
+    def test_05_order_ring_round_trip(self):
+        """Tests that orders published into the shared-memory ring are consumed intact and in order."""
+        producer = SharedOrderRing(shm_name="test_shm_orders", capacity=4, create=True)
+        consumer = SharedOrderRing(shm_name="test_shm_orders", create=False)
+        try:
+            self.assertEqual(consumer.capacity, 4, "Attach should read the capacity from the ring header")
+            with self.assertRaises(ValueError):
+                SharedOrderRing(shm_name="test_shm_orders", capacity=8, create=False)
+
+            orders = [{
+                'order_id': i,
+                'symbol': 'GOOGL',
+                'side': 'BUY' if i % 2 else 'SELL',
+                'quantity': 10,
+                'price': 300.25 + i,
+                'timestamp': 1700000000.5
+            } for i in range(5)]
+
+            published = [producer.publish(order) for order in orders]
+            self.assertEqual(published, [True] * 4 + [False], "A full ring should reject new orders")
+
+            self.assertEqual(consumer.consume(), orders[:4])
+            self.assertEqual(consumer.consume(), [], "Drained ring should be empty")
+            self.assertTrue(producer.publish(orders[4]), "Consumed slots should be reusable")
+            self.assertEqual(consumer.consume(), orders[4:])
+        finally:
+            consumer.cleanup()
+            producer.cleanup()
+
+    # ----------------------------------------------------------------------
+    def test_06_shared_memory_cache_line_layout(self):
+        """Tests that the seq counter, price array and reader slots each start on their own cache line."""
+        seq_addr = self.shm_book.seq.ctypes.data
+        prices_addr = self.shm_book.prices.ctypes.data
+        readers_addr = self.shm_book.reader_seqs.ctypes.data
+
+        for addr in (seq_addr, prices_addr, readers_addr):
+            self.assertEqual(addr % CACHE_LINE_SIZE, 0)
+        self.assertEqual(prices_addr - seq_addr, CACHE_LINE_SIZE)
+        self.assertGreaterEqual(readers_addr, prices_addr + self.shm_book.prices.nbytes)
+        self.assertEqual(self.shm_book.reader_seqs.strides, (CACHE_LINE_SIZE,))
+
+        # Reader slots track the last snapshot each reader saw
+        self.shm_book.read_prices(reader_id=1)
+        self.assertFalse(self.shm_book.has_update(1))
+        self.shm_book.update(SYMBOLS[0], 123.0)
+        self.assertTrue(self.shm_book.has_update(1))
+
+    # ----------------------------------------------------------------------
+    def test_07_shared_memory_attach_reuses_mapping(self):
+        """Tests that attaching the same book twice shares one mapping until the last detach."""
+        first = SharedPriceBook(symbols=SYMBOLS, shm_name=self.SHM_NAME, create=False)
+        second = SharedPriceBook(symbols=SYMBOLS, shm_name=self.SHM_NAME, create=False)
+        try:
+            self.assertIs(first.shm, second.shm)
+
+            first.cleanup()
+            self.shm_book.update(SYMBOLS[1], 42.0)
+            self.assertEqual(second.read_all()[SYMBOLS[1]], 42.0, "Mapping should outlive the first detach")
+        finally:
+            first.cleanup()
+            second.cleanup()
+
+    # ----------------------------------------------------------------------
+    def test_08_strategy_kernel_matches_numpy(self):
+        """Tests that the strategy kernel (numba when installed) and the NumPy path agree tick for tick."""
+        # Without numba, check the kernel's pure-Python source so the two paths still cannot drift
+        kernel = STRATEGY_KERNEL if STRATEGY_KERNEL is not None else _strategy_step
+        kernel_state = StrategyState(SYMBOLS)
+        numpy_state = StrategyState(SYMBOLS)
+        rng = np.random.default_rng(7)
+        signals_seen = 0
+
+        for tick in range(3 * MAX_HISTORY):
+            prices = rng.uniform(90.0, 110.0, len(SYMBOLS))
+            prices[rng.random(len(SYMBOLS)) < 0.2] = 0.0  # Uninitialized symbols, incl. during warm-up
+            if tick < 3:
+                prices[:] = 0.0
+            sentiment = int(rng.integers(0, 101))
+
+            news_signal = kernel(kernel_state.prices, kernel_state.idx, kernel_state.count, kernel_state.sum_short,
+                                 kernel_state.sum_long, prices, sentiment, kernel_state.short_ma,
+                                 kernel_state.long_ma, kernel_state.signals)
+            numpy_state.update_price_history(prices)
+            expected_signal, short_ma, long_ma, expected_news = numpy_state.compute_signals(prices, sentiment)
+
+            self.assertEqual(news_signal, expected_news, f"tick {tick}")
+            np.testing.assert_array_equal(kernel_state.signals, expected_signal, err_msg=f"tick {tick}")
+            np.testing.assert_allclose(kernel_state.short_ma, short_ma, err_msg=f"tick {tick}")
+            np.testing.assert_allclose(kernel_state.long_ma, long_ma, err_msg=f"tick {tick}")
+            signals_seen += np.count_nonzero(expected_signal)
+
+        self.assertGreater(signals_seen, 0, "Ticks should exercise non-neutral signals too")
+
+        np.testing.assert_array_equal(kernel_state.idx, numpy_state.idx)
+        np.testing.assert_array_equal(kernel_state.count, numpy_state.count)
+        np.testing.assert_allclose(kernel_state.prices, numpy_state.prices)
+
+    # ----------------------------------------------------------------------
+    def test_09_recv_buffer_framing(self):
+        """Tests RecvBuffer framing over a socketpair: split, batched, compacted and oversized frames."""
+        sender, receiver = socket.socketpair()
+        try:
+            # 1. One frame split across two reads
+            recv_buffer = RecvBuffer(capacity=16)
+            sender.sendall(b'{"a":')
+            recv_buffer.recv_into(receiver)
+            self.assertIsNone(recv_buffer.next_frame(MESSAGE_DELIMITER), "Partial frame must stay buffered")
+            sender.sendall(b'1}\n')
+            recv_buffer.recv_into(receiver)
+            self.assertEqual(bytes(recv_buffer.next_frame(MESSAGE_DELIMITER)), b'{"a":1}')
+
+            # 2. Several frames arriving in one read
+            sender.sendall(b'one\ntwo\nthr')
+            recv_buffer.recv_into(receiver)
+            self.assertEqual(bytes(recv_buffer.next_frame(MESSAGE_DELIMITER)), b'one')
+            self.assertEqual(bytes(recv_buffer.next_frame(MESSAGE_DELIMITER)), b'two')
+            self.assertIsNone(recv_buffer.next_frame(MESSAGE_DELIMITER))
+
+            # 3. head is now past the midpoint: the next read first moves 'thr' to the front
+            self.assertGreater(recv_buffer.head, len(recv_buffer.buffer) // 2)
+            sender.sendall(b'ee\n')
+            recv_buffer.recv_into(receiver)
+            self.assertEqual(bytes(recv_buffer.next_frame(MESSAGE_DELIMITER)), b'three')
+            self.assertEqual(recv_buffer.head, recv_buffer.tail)
+            self.assertEqual(recv_buffer.tail, len(b'three\n'), "Unread bytes should have been compacted")
+
+            # 4. A frame larger than the whole buffer
+            small_buffer = RecvBuffer(capacity=8)
+            sender.sendall(b'x' * 8)
+            small_buffer.recv_into(receiver)
+            self.assertIsNone(small_buffer.next_frame(MESSAGE_DELIMITER))
+            with self.assertRaises(BufferError):
+                small_buffer.recv_into(receiver)
+        finally:
+            sender.close()
+            receiver.close()
+
+    # ----------------------------------------------------------------------
+    def test_10_price_record_reader_keeps_latest(self):
+        """Tests that PriceRecordReader keeps only the newest record and carries a partial one over."""
+        record_size = price_record_size(len(SYMBOLS))
+        ticks = np.array([[tick + 0.25 * i for i in range(len(SYMBOLS))] for tick in range(3)], dtype=PRICE_WIRE_DTYPE)
+        wire = ticks.tobytes()
+        sender, receiver = socket.socketpair()
+        try:
+            reader = PriceRecordReader(record_size, batch_records=8)
+            latest = np.frombuffer(reader.latest, dtype=PRICE_WIRE_DTYPE)
+
+            # Two and a half records in one read: the second is the newest complete one
+            sender.sendall(wire[:2 * record_size + 5])
+            reader.read_latest(receiver)
+            np.testing.assert_array_equal(latest, ticks[1])
+            self.assertEqual(reader.filled, 5, "Partial record should stay buffered")
+
+            # The rest of the third record completes it (non-blocking drain)
+            receiver.setblocking(False)
+            self.assertFalse(reader.drain_latest(receiver), "Nothing new to read yet")
+            sender.sendall(wire[2 * record_size + 5:])
+            self.assertTrue(reader.drain_latest(receiver))
+            np.testing.assert_array_equal(latest, ticks[2])
+            self.assertEqual(reader.filled, 0)
+
+            sender.close()
+            with self.assertRaises(SocketStreamClosed):
+                reader.drain_latest(receiver)
+        finally:
+            sender.close()
+            receiver.close()
+
 
 if __name__ == '__main__':
     print("Running unit tests...")